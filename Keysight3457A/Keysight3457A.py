@@ -1,5 +1,26 @@
-import pyvisa
+# pyvisa und numpy werden erst bei Bedarf importiert (connect / Mehrfachmessung),
+# damit der reine Import dieses Moduls schnell bleibt.
+import logging
 import time
+from contextlib import contextmanager
+
+_log = logging.getLogger(__name__)
+
+# Gemeinsamer ResourceManager für alle Instanzen im Prozess.
+# Das Anlegen lädt die VISA-Bibliothek und kann bis zu Sekunden dauern.
+_RM = None
+
+
+def _get_rm():
+    """
+    Liefert den prozessweiten ResourceManager (wird beim ersten Aufruf erzeugt).
+    """
+    global _RM
+    if _RM is None:
+        import pyvisa
+        _RM = pyvisa.ResourceManager()
+    return _RM
+
 
 class HP3457A:
     """
@@ -7,40 +28,214 @@ class HP3457A:
     Berücksichtigt die HPML-Syntax (kein SCPI) und State-Management.
     """
 
-    def __init__(self, resource_name):
+    _VALID_MODES = frozenset(('DCV', 'ACV', 'DCI', 'ACI', 'OHM', 'OHMF', 'FREQ', 'PER'))
+
+    # NPLC-Werte, die das 3457A exakt einstellt. Andere Werte passt das Gerät an,
+    # dann ist nur die Antwort auf NPLC? verlässlich.
+    _VALID_NPLC = frozenset((0.0005, 0.005, 0.1, 1.0, 10.0, 100.0))
+
+    # Dauer eines Power Line Cycles im ungünstigsten Fall (50 Hz) in Millisekunden
+    _PLC_MS = 20
+
+    # Maximale Anzahl gemerkter Befehlsfolgen aus compile_sequence
+    _MAX_COMPILED = 32
+
+    # Obergrenze für eine ASCII-Messwertzeile inkl. Terminator (typ. ~16 Bytes)
+    _MAX_READING_BYTES = 64
+
+    # Feste Wartezeit nach PRESET, wenn kein GPIB Serial Poll möglich ist (z.B. ASRL)
+    _RESET_WAIT = 1.0
+
+    # Bit 4 im Status Byte des 3457A: "Ready for instructions"
+    _STB_READY = 0x10
+
+    # Binäre Ausgabeformate des 3457A -> struct-Datentyp (Big Endian)
+    _BINARY_DATATYPES = {'SINT': 'h', 'DINT': 'i'}
+
+    # Unskaliertes Speicherformat (Standard nach PRESET), auch bei Autorange gültig
+    _DEFAULT_MFORMAT = 'SREAL'
+
+    # Bit 7 im Status Byte des 3457A: "Data available"
+    _STB_DATA_AVAILABLE = 0x80
+
+    def __init__(self, resource_name, ready_poll_interval=0.02, connect_timeout=5000,
+                 io_timeout=2000, post_reset_wait=None, post_measure_delay=0.0):
         """
         Initialisiert die Klasse mit der VISA-Ressourcenadresse.
         Baut noch keine Verbindung auf.
         
         :param resource_name: String, z.B. 'GPIB0::22::INSTR' oder 'ASRL1::INSTR'
+        :param ready_poll_interval: Start-Intervall in Sekunden für das Abfragen
+                                    des Status Bytes nach einem Reset (Standard: 0.02s)
+        :param connect_timeout: Timeout für open_resource in Millisekunden (Standard: 5000ms)
+        :param io_timeout: Timeout für Lese-/Schreibzugriffe in Millisekunden (Standard: 2000ms)
+        :param post_reset_wait: Feste Wartezeit in Sekunden nach PRESET. None (Standard)
+                                -> bei GPIB Status Byte abfragen, bis das Gerät bereit ist,
+                                sonst 1s warten
+        :param post_measure_delay: Pause in Sekunden nach jeder Einzelmessung (Standard: 0.0)
         """
         self.resource_name = resource_name
+        self.ready_poll_interval = ready_poll_interval
+        self.connect_timeout = connect_timeout
+        self.io_timeout = io_timeout
+        self.post_reset_wait = post_reset_wait
+        self.post_measure_delay = post_measure_delay
+
+        # Übertragungsformat für read_bulk, siehe set_format
+        self._bulk_format = 'DINT'
         self.inst = None
         self.rm = None
         self.is_connected = False
 
-    def connect(self, timeout=5000):
+        # Zwischengespeicherter Gerätezustand (Trigger, Modus, NPLC).
+        # Wird bei jedem _write aktualisiert, damit wir unnötige
+        # GPIB-Abfragen und Befehle sparen können.
+        self._state = {}
+
+        # Vorübersetzte Befehlsfolgen (bytes) -> (Zustandsänderung, zu löschende Einträge),
+        # siehe compile_sequence. Höchstens _MAX_COMPILED Einträge, älteste fallen heraus.
+        self._compiled = {}
+
+    def invalidate(self):
+        """
+        Verwirft den zwischengespeicherten Gerätezustand.
+        Aufrufen, wenn das Gerät außerhalb dieser Klasse verändert wurde
+        (z.B. direktes inst.write oder Bedienung an der Front).
+        """
+        self._state.clear()
+
+    def _update_state(self, cmd, state=None):
+        """
+        Wertet einen (evtl. zusammengesetzten) HPML-Befehl aus und
+        aktualisiert den internen Zustands-Cache.
+        
+        :param state: Ziel-Dict, Standard ist der Cache der Instanz
+        """
+        if state is None:
+            state = self._state
+
+        for part in cmd.split(';'):
+            tokens = part.replace(',', ' ').split()
+            if not tokens:
+                continue
+            head = tokens[0].upper()
+            arg = tokens[1].upper() if len(tokens) > 1 else None
+
+            if head in ('PRESET', 'RESET'):
+                # Nach einem Reset ist der Zustand unbekannt
+                state.clear()
+            elif head == 'TRIG' and arg:
+                # Nach 'TRIG SGL' kehrt das Gerät selbst in HOLD zurück
+                state['trig'] = 'HOLD' if arg == 'SGL' else arg
+                # Ohne Reading Memory liegen danach NRDGS Messwerte im Ausgabepuffer
+                if arg == 'SGL' and state.get('mem', 'OFF') == 'OFF':
+                    state['pending'] = state.get('nrdgs', 1)
+            elif head == 'NPLC' and arg:
+                try:
+                    nplc = float(arg)
+                except ValueError:
+                    nplc = None
+                # Nur exakt unterstützte Werte cachen, sonst fragt get_nplc nach
+                if nplc in self._VALID_NPLC:
+                    state['nplc'] = nplc
+                else:
+                    state.pop('nplc', None)
+            elif head in ('OFORMAT', 'MFORMAT') and arg:
+                state[head.lower()] = arg
+            elif head == 'MEM' and arg:
+                state['mem'] = arg
+            elif head == 'NRDGS' and arg:
+                try:
+                    state['nrdgs'] = int(float(arg))
+                except ValueError:
+                    state.pop('nrdgs', None)
+            elif head in self._VALID_MODES:
+                state['mode'] = head
+                state['range'] = arg or 'AUTO'
+
+    def _write(self, cmd):
+        """
+        Sendet einen Befehl an das Gerät und führt den Zustands-Cache nach.
+        """
+        self.inst.write(cmd)
+        self._update_state(cmd)
+
+    def _wait_ready(self, timeout):
+        """
+        Wartet per Serial Poll, bis das Gerät wieder Befehle annimmt.
+        Das Abfrage-Intervall wird exponentiell vergrößert (max. 0.2s).
+        
+        :param timeout: Maximale Wartezeit in Millisekunden
+        """
+        import pyvisa
+        from pyvisa import constants
+
+        deadline = time.monotonic() + timeout / 1000
+        i = 0
+        while True:
+            try:
+                if self.inst.read_stb() & self._STB_READY:
+                    return
+            except pyvisa.errors.VisaIOError as e:
+                # Gerät antwortet während des Resets evtl. noch nicht (Timeout),
+                # alle anderen Fehler sind echte Fehler
+                if e.error_code != constants.StatusCode.error_timeout:
+                    raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Gerät nach {timeout} ms nicht bereit")
+            time.sleep(min(self.ready_poll_interval * 2 ** i, 0.2, remaining))
+            i += 1
+
+    def _is_gpib(self):
+        """
+        True, wenn die geöffnete Ressource über GPIB angesprochen wird.
+        """
+        from pyvisa import constants
+
+        return self.inst.interface_type == constants.InterfaceType.gpib
+
+    def connect(self, timeout=None):
         """
         Verbindet zum Gerät und setzt Basis-Parameter.
         
-        :param timeout: Timeout in Millisekunden (Standard: 5000ms)
+        :param timeout: I/O-Timeout in Millisekunden. None (Standard) -> io_timeout
         """
+        if timeout is not None:
+            self.io_timeout = timeout
+
+        # Neue Verbindung: bisheriger Zustands-Cache ist nicht mehr gültig
+        self.invalidate()
+
         try:
-            self.rm = pyvisa.ResourceManager()
-            self.inst = self.rm.open_resource(self.resource_name)
+            self.rm = _get_rm()
+            self.inst = self.rm.open_resource(self.resource_name,
+                                              open_timeout=self.connect_timeout)
             
             # Konfiguration der Kommunikation
-            self.inst.timeout = timeout
+            self.inst.timeout = self.io_timeout
             
             # WICHTIG für HP 3457A: EOL (End of Line) Konfiguration
             # Das Gerät erwartet meist \n oder \r\n. PyVISA fügt dies automatisch an write an.
             self.inst.read_termination = '\n'
             self.inst.write_termination = '\n'
+
+            # Großer Lesepuffer, damit eine Antwort mit einem einzigen viRead
+            # abgeholt wird statt in vielen kleinen Stücken.
+            self.inst.chunk_size = 32768
             
             # Reset des Geräts, um in einen definierten Zustand zu kommen
             # 'PRESET' ist der HPML Befehl für Reset
-            self.inst.write("PRESET")
-            time.sleep(1.0) # Kurze Pause nach Reset
+            self._write("PRESET")
+            # Bei GPIB statt fest zu warten: Status Byte abfragen, bis das Gerät bereit ist.
+            # Über andere Schnittstellen (z.B. ASRL) gibt es keinen echten Serial Poll.
+            if self.post_reset_wait is not None:
+                time.sleep(self.post_reset_wait)
+            elif self._is_gpib():
+                self._wait_ready(self.io_timeout)
+            else:
+                time.sleep(self._RESET_WAIT)
             
             # Setze das Gerät sofort in 'TRIG HOLD'.
             # Das verhindert, dass das Gerät sofort anfängt zu messen und den Buffer füllt.
@@ -60,34 +255,81 @@ class HP3457A:
         Trennt die Verbindung sauber und gibt Ressourcen frei.
         """
         if self.inst:
+            import pyvisa
+
             try:
                 # Optional: Gerät in lokalen Modus versetzen
                 self.inst.write("LOCAL")
-            except:
-                pass
-            self.inst.close()
+            except pyvisa.errors.VisaIOError as e:
+                _log.debug("LOCAL beim Trennen fehlgeschlagen: %s", e)
+
+            # Eigener try-Block: auch wenn close() scheitert, wird der Zustand
+            # der Instanz zurückgesetzt.
+            try:
+                self.inst.close()
+            except pyvisa.errors.VisaIOError as e:
+                _log.debug("Schließen der VISA-Session fehlgeschlagen: %s", e)
+            self.inst = None
         
-        if self.rm:
-            self.rm.close()
+        # Der ResourceManager wird von allen Instanzen geteilt und bleibt offen.
+        # Zum Prozessende: HP3457A.shutdown_rm()
+        self.rm = None
             
         self.is_connected = False
         print("Verbindung getrennt.")
 
+    @staticmethod
+    def shutdown_rm():
+        """
+        Schließt den gemeinsamen ResourceManager (z.B. am Programmende).
+        Alle noch offenen Verbindungen werden damit ungültig. Deren is_connected
+        bleibt aber True, daher vorher alle Instanzen mit disconnect() trennen.
+        """
+        global _RM
+        if _RM is not None:
+            _RM.close()
+            _RM = None
+
+    def _flush_output(self):
+        """
+        Stoppt die Messung und leert den Ausgabepuffer per Device Clear, falls der
+        Trigger nicht sicher auf HOLD steht oder noch Messwerte ausstehen.
+        Sonst ist der Puffer leer und es wird nichts gesendet.
+        """
+        if self._state.get('trig') != 'HOLD' or self._state.get('pending'):
+            self.stop_measurement()
+            self.inst.clear()
+            self._state['pending'] = 0
+
     def read_id(self):
         """
         Liest die Identifikation des Geräts aus.
         Nutzt 'ID?' statt '*IDN?'.
+        
+        Ein Device Clear wird nur gesendet, wenn der Trigger nicht sicher auf
+        HOLD steht oder noch Messwerte im Ausgabepuffer liegen. Nach invalidate()
+        ist der Zustand unbekannt, dann wird immer geleert.
         """
         if not self.is_connected:
             raise Exception("Gerät nicht verbunden")
         
         # Sicherstellen, dass wir nicht gerade wild messen (Buffer leeren)
-        self.inst.clear()
+        self._flush_output()
         
         # Befehl senden und Antwort lesen
         response = self.inst.query("ID?")
         return response.strip()
 
+    def _check_mode(self, mode):
+        """
+        Prüft den Messmodus und gibt ihn in Großbuchstaben zurück.
+        """
+        mode = mode.upper()
+        if mode not in self._VALID_MODES:
+            allowed = ', '.join(sorted(self._VALID_MODES))
+            raise ValueError(f"Unbekannter Modus: {mode}. Erlaubt: {allowed}")
+        return mode
+
     def setup_measurement(self, mode, range_val="AUTO"):
         """
         Konfiguriert, WAS gemessen werden soll.
@@ -98,17 +340,45 @@ class HP3457A:
         if not self.is_connected:
             raise Exception("Gerät nicht verbunden")
             
-        valid_modes = ['DCV', 'ACV', 'DCI', 'ACI', 'OHM', 'OHMF', 'FREQ', 'PER']
-        mode = mode.upper()
-        
-        if mode not in valid_modes:
-            raise ValueError(f"Unbekannter Modus: {mode}. Erlaubt: {valid_modes}")
+        mode = self._check_mode(mode)
             
         # Befehl zusammensetzen: z.B. "DCV AUTO" oder "OHM 1000"
         cmd = f"{mode} {range_val}"
-        self.inst.write(cmd)
+        self._write(cmd)
         print(f"Messmodus gesetzt: {cmd}")
 
+    def configure(self, mode, range_val="AUTO", nplc=None, trig="HOLD"):
+        """
+        Setzt Trigger, Messmodus und (optional) NPLC mit EINEM Schreibzugriff.
+        HPML erlaubt mehrere durch ';' getrennte Befehle in einer Zeile.
+        
+        :param mode: siehe setup_measurement
+        :param range_val: 'AUTO' oder ein numerischer Wert
+        :param nplc: Integrationszeit in PLC oder None (unverändert lassen)
+        :param trig: Trigger-Modus, Standard 'HOLD' (Konfigurationsmodus).
+                     Andere Trigger werden erst nach der Konfiguration gesendet.
+        """
+        if not self.is_connected:
+            raise Exception("Gerät nicht verbunden")
+
+        mode = self._check_mode(mode)
+
+        # z.B. "TRIG HOLD;DCV AUTO;NPLC 10"
+        cmd = f"{mode} {range_val}"
+        if nplc is not None:
+            cmd += f";NPLC {nplc}"
+
+        # HOLD zuerst, damit während des Umkonfigurierens nicht gemessen wird.
+        # Jeder andere Trigger (AUTO, SGL) erst am Ende, sonst misst das Gerät
+        # noch mit der alten Konfiguration.
+        trig = trig.upper()
+        if trig == 'HOLD':
+            cmd = f"TRIG {trig};" + cmd
+        else:
+            cmd += f";TRIG {trig}"
+        self._write(cmd)
+        print(f"Konfiguration gesetzt: {cmd}")
+
     def set_nplc(self, plc):
         """
         Setzt die Integrationszeit in Power Line Cycles (NPLC).
@@ -119,10 +389,13 @@ class HP3457A:
         if not self.is_connected:
             raise Exception("Gerät nicht verbunden")
         
-        # Sicherstellen, dass wir im Konfigurationsmodus sind (nicht messen)
-        self.stop_measurement()
-        
-        self.inst.write(f"NPLC {plc}")
+        # Sicherstellen, dass wir im Konfigurationsmodus sind (nicht messen).
+        # Ist der Trigger schon auf HOLD, entfällt das TRIG HOLD, sonst wird
+        # es im selben Schreibzugriff mitgeschickt.
+        cmd = f"NPLC {plc}"
+        if self._state.get('trig') != 'HOLD':
+            cmd = "TRIG HOLD;" + cmd
+        self._write(cmd)
 
     def get_nplc(self):
         """
@@ -130,13 +403,19 @@ class HP3457A:
         """
         if not self.is_connected:
             raise Exception("Gerät nicht verbunden")
+
+        # Bekannter Wert aus dem Cache -> keine GPIB-Abfrage nötig
+        if self._state.get('nplc') is not None:
+            return self._state['nplc']
             
-        # Wir müssen sicherstellen, dass das Gerät nicht misst, sonst
-        # bekommen wir evtl. einen Messwert statt der NPLC Antwort.
-        self.stop_measurement()
+        # Wir müssen sicherstellen, dass das Gerät nicht misst und kein Messwert
+        # mehr im Puffer liegt, sonst bekommen wir evtl. einen Messwert statt
+        # der NPLC Antwort.
+        self._flush_output()
         
-        val = self.inst.query("NPLC?")
-        return float(val)
+        val = float(self.inst.query("NPLC?"))
+        self._state['nplc'] = val
+        return val
 
     def start_measurement(self):
         """
@@ -144,16 +423,24 @@ class HP3457A:
         Vorsicht: Das Gerät sendet nun Daten, wenn man liest.
         Andere Befehle (wie ID?) können fehlschlagen, wenn man dies nicht stoppt.
         """
+        # Bereits im Free Run -> nichts zu tun
+        if self._state.get('trig') == 'AUTO':
+            return
+
         # 'TRIG AUTO' lässt das DMM so schnell wie möglich messen
-        self.inst.write("TRIG AUTO")
+        self._write("TRIG AUTO")
 
     def stop_measurement(self):
         """
         Stoppt die Messung (Trigger Hold).
         Notwendig, um Konfigurationen zu ändern oder IDs zu lesen.
         """
+        # Bereits angehalten -> nichts zu tun
+        if self._state.get('trig') == 'HOLD':
+            return
+
         # 'TRIG HOLD' pausiert die Messung
-        self.inst.write("TRIG HOLD")
+        self._write("TRIG HOLD")
 
     def read_single_value(self):
         """
@@ -178,71 +465,308 @@ class HP3457A:
         # Das 3457A hat keinen expliziten "READ?" Befehl wie SCPI.
         # Aber wir können SGL Trigger nutzen und dann lesen.
         
-        self.inst.write("TRIG SGL")
-        value_str = self.inst.read()
-        return float(value_str)
-
-
-# --------------------------------------------------------------------------
-# TEST BEREICH
-# --------------------------------------------------------------------------
-if __name__ == "__main__":
-    # BITTE ANPASSEN: Hier die korrekte VISA Resource ID eintragen!
-    # Für GPIB meist: 'GPIB0::22::INSTR' (wobei 22 die Adresse ist)
-    # Für Seriell über VISA Adapter: 'ASRL1::INSTR'
-    VISA_ADDRESS = 'GPIB0::22::INSTR' 
-    
-    # Mocking für Testzwecke, falls kein Gerät angeschlossen ist,
-    # würde dies fehlschlagen. Daher Try/Except Block für Demo.
-    
-    print("--- Start HP 3457A Test ---")
-    
-    dmm = HP3457A(VISA_ADDRESS)
-    
-    try:
-        # 1. Verbinden
-        print(f"Verbinde zu {VISA_ADDRESS}...")
-        dmm.connect(timeout=10000) # Etwas mehr Timeout für Init
-        
-        # 2. ID Auslesen
-        dev_id = dmm.read_id()
-        print(f"Geräte ID: {dev_id}")
-        
-        # 3. DC Spannung konfigurieren
-        print("Konfiguriere DC Voltage...")
-        dmm.setup_measurement("DCV", range_val="AUTO")
-        
-        # 4. NPLC setzen und prüfen
-        print("Setze NPLC auf 10...")
-        dmm.set_nplc(10)
-        current_nplc = dmm.get_nplc()
-        print(f"Gelesenes NPLC: {current_nplc}")
-        
-        # 5. Messung durchführen (Einzelmessungen)
-        print("Starte 3 Einzelmessungen (Trigger Single)...")
-        for i in range(3):
-            val = dmm.read_single_value()
-            print(f"Messwert {i+1}: {val} V")
-            time.sleep(0.5)
-            
-        # 6. Ohmmessung Test
-        print("Wechsle zu 2-Wire Ohm...")
-        dmm.setup_measurement("OHM")
-        
-        # Schnellere Messung für Ohm
-        dmm.set_nplc(1) 
-        
-        val_ohm = dmm.read_single_value()
-        print(f"Widerstand: {val_ohm} Ohm")
-        
-    except pyvisa.errors.VisaIOError as e:
-        print("\nACHTUNG: VISA Fehler aufgetreten.")
-        print("Ist das Gerät angeschlossen und die Adresse korrekt?")
-        print(f"Detailfehler: {e}")
-    except Exception as e:
-        print(f"\nEin allgemeiner Fehler ist aufgetreten: {e}")
-    finally:
-        # Immer sauber trennen
-        print("Trenne Verbindung...")
-        dmm.disconnect()
-        print("--- Test Ende ---")
\ No newline at end of file
+        self._write(self._single_reading_prefix() + "TRIG SGL")
+        raw = self._read_raw_value()
+
+        if self.post_measure_delay:
+            time.sleep(self.post_measure_delay)
+        return float(raw)
+
+    async def read_single_value_async(self, timeout=None):
+        """
+        Wie read_single_value, blockiert aber nicht während der Integrationszeit.
+        Das Gerät meldet per SRQ (Service Request), wenn der Messwert bereit ist.
+        So lassen sich mehrere DMMs parallel auslesen, z.B. mit asyncio.gather.
+        
+        Hinweis: Teilen sich mehrere Geräte einen GPIB-Bus, ist die Übertragung
+        selbst weiterhin seriell. Parallel laufen nur die Messungen.
+        
+        :param timeout: Maximale Wartezeit auf den SRQ in Millisekunden.
+                        None -> io_timeout plus Integrationszeit
+        """
+        import asyncio
+        from pyvisa import constants
+
+        if not self.is_connected:
+            raise Exception("Gerät nicht verbunden")
+
+        if timeout is None:
+            timeout = self._burst_timeout(1)
+
+        event_type = constants.EventType.service_request
+        mechanism = constants.EventMechanism.queue
+
+        self.inst.discard_events(event_type, mechanism)
+        self.inst.enable_event(event_type, mechanism)
+        try:
+            # SRQ bei "Data available" freigeben und Messung auslösen
+            self._write(self._single_reading_prefix() + f"RQS {self._STB_DATA_AVAILABLE};TRIG SGL")
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.inst.wait_on_event, event_type, timeout)
+
+            # Serial Poll setzt den SRQ zurück
+            self.inst.read_stb()
+            raw = self._read_raw_value()
+        except BaseException:
+            # Z.B. Timeout beim Warten: der Messwert kann noch ausstehen, obwohl
+            # der Cache nach TRIG SGL schon HOLD annimmt
+            self.invalidate()
+            raise
+        finally:
+            self.inst.disable_event(event_type, mechanism)
+            # SRQ-Maske wieder löschen, sonst meldet jede spätere Messung SRQ
+            self._write("RQS 0")
+
+        if self.post_measure_delay:
+            await asyncio.sleep(self.post_measure_delay)
+        return float(raw)
+
+    def _single_reading_prefix(self):
+        """
+        Liefert die Befehle ('OFORMAT ASCII;', 'MEM OFF;NRDGS 1,AUTO;'), die einem
+        Einzeltrigger vorangestellt werden müssen, sonst einen leeren String.
+        """
+        # Fehlt ein Eintrag (nach PRESET, invalidate() oder fehlgeschlagenem Lesen),
+        # ist der Zustand unbekannt -> sicherheitshalber mitschicken.
+        prefix = ""
+        # Einzelmessungen werden als ASCII-Text gelesen (z.B. nach einem
+        # abgebrochenen Binär-Burst steht das Gerät noch auf DINT)
+        if self._state.get('oformat') != 'ASCII':
+            prefix += "OFORMAT ASCII;"
+        # Nach read_n_values: Reading Memory aus und wieder 1 Messung pro Trigger,
+        # sonst landet der Messwert im Speicher statt im Ausgabepuffer.
+        if self._state.get('mem') != 'OFF' or self._state.get('nrdgs') != 1:
+            prefix += "MEM OFF;NRDGS 1,AUTO;"
+        return prefix
+
+    def _read_raw_value(self):
+        """
+        Liest eine Messwertzeile als Bytes (ohne Dekodierung zu str).
+        float() akzeptiert die Bytes inkl. Terminator direkt.
+        """
+        with self._reading(1):
+            raw = self.inst.read_bytes(self._MAX_READING_BYTES, break_on_termchar=True)
+
+        if self._state.get('pending'):
+            self._state['pending'] -= 1
+        return raw
+
+    def _burst_timeout(self, n):
+        """
+        Timeout in Millisekunden für einen Lesezugriff, der auf N Messungen warten muss:
+        io_timeout plus doppelte Integrationszeit pro Messung (Reserve für Autorange
+        und Einschwingen). Bei unbekanntem NPLC wird vom Maximum (100) ausgegangen.
+        """
+        if self._state.get('mode') in ('FREQ', 'PER'):
+            # Frequenzmessung: Torzeit bis 1s, unabhängig von NPLC
+            per_reading = 1000
+        else:
+            nplc = self._state.get('nplc') or max(self._VALID_NPLC)
+            per_reading = max(nplc * self._PLC_MS, 100)
+        return int(self.io_timeout + 2 * n * per_reading)
+
+    @contextmanager
+    def _reading(self, n):
+        """
+        Setzt den VISA-Timeout für die Dauer eines Lesezugriffs auf _burst_timeout(n).
+        Schlägt das Lesen fehl oder wird abgebrochen, ist unklar, was noch im
+        Ausgabepuffer liegt -> Zustands-Cache verwerfen.
+        """
+        self.inst.timeout = self._burst_timeout(n)
+        try:
+            yield
+        except BaseException:
+            self.invalidate()
+            raise
+        finally:
+            self.inst.timeout = self.io_timeout
+
+    def compile_sequence(self, mode, range_val="AUTO", nplc=1):
+        """
+        Übersetzt Konfiguration + Einzeltrigger EINMAL in fertige Bytes für fast_read.
+        Sinnvoll für Sweeps, in denen Modus/Bereich/NPLC konstant bleiben.
+        
+        :param mode: siehe setup_measurement
+        :param range_val: 'AUTO' oder ein numerischer Wert
+        :param nplc: Integrationszeit in PLC
+        :return: bytes, z.B. b'TRIG HOLD;DCV AUTO;NPLC 10;TRIG SGL\\n'
+        """
+        mode = self._check_mode(mode)
+
+        cmd = f"TRIG HOLD;{mode} {range_val};NPLC {nplc};TRIG SGL"
+        compiled = f"{cmd}\n".encode('ascii')
+
+        # Zustandsänderung gleich mit vorberechnen, damit fast_read nicht parsen muss.
+        # Einträge, die der Befehl entfernt (z.B. nicht exakt unterstütztes NPLC),
+        # müssen auch im Cache gelöscht werden.
+        state = {}
+        self._update_state(cmd, state)
+        removed = tuple(k for k in ('trig', 'mode', 'range', 'nplc') if k not in state)
+
+        if compiled not in self._compiled and len(self._compiled) >= self._MAX_COMPILED:
+            del self._compiled[next(iter(self._compiled))]
+        self._compiled[compiled] = (state, removed)
+        return compiled
+
+    def fast_read(self, compiled_bytes):
+        """
+        Sendet eine mit compile_sequence erzeugte Befehlsfolge und liest den Messwert.
+        Keine String-Formatierung pro Aufruf.
+        
+        :param compiled_bytes: Rückgabewert von compile_sequence
+        """
+        if not self.is_connected:
+            raise Exception("Gerät nicht verbunden")
+
+        # Wie read_single_value: nach read_n_values Reading Memory im selben
+        # Schreibzugriff abschalten
+        prefix = self._single_reading_prefix()
+        if prefix:
+            self.inst.write_raw(prefix.encode('ascii') + compiled_bytes)
+            self._update_state(prefix)
+        else:
+            self.inst.write_raw(compiled_bytes)
+
+        entry = self._compiled.get(compiled_bytes)
+        if entry is None:
+            self._update_state(compiled_bytes.decode('ascii'))
+        else:
+            update, removed = entry
+            self._state.update(update)
+            for key in removed:
+                self._state.pop(key, None)
+
+        return float(self._read_raw_value())
+
+    def read_n_values(self, n, store_in_mem=True):
+        """
+        Führt N Messungen mit EINEM Trigger durch und gibt sie als numpy-Array zurück.
+        Das Gerät taktet die Messungen selbst, es sind keine Pausen nötig.
+        
+        :param n: Anzahl der Messungen
+        :param store_in_mem: True -> Messwerte im internen Reading Memory sammeln
+                             und mit einem einzigen RMEM auslesen.
+                             False -> Messwerte einzeln aus dem Ausgabepuffer lesen.
+        """
+        if not self.is_connected:
+            raise Exception("Gerät nicht verbunden")
+
+        import numpy as np
+
+        n = int(n)
+        if n < 1:
+            raise ValueError(f"Ungültige Anzahl Messungen: {n}")
+
+        if store_in_mem:
+            return self.read_bulk(n)
+
+        self._write(f"MEM OFF;NRDGS {n},AUTO;TRIG SGL")
+        return np.array([float(self._read_raw_value()) for _ in range(n)])
+
+    def set_format(self, fmt):
+        """
+        Legt das Übertragungsformat für read_bulk / read_n_values fest.
+        
+        :param fmt: 'DINT' (Standard, 4 Byte pro Messwert), 'SINT' (2 Byte, geringere
+                    Auflösung) oder 'ASCII' (~16 Byte, z.B. zur Fehlersuche)
+        """
+        self._bulk_format = self._check_format(fmt)
+
+    def _check_format(self, fmt):
+        """
+        Prüft das Übertragungsformat und gibt es in Großbuchstaben zurück.
+        """
+        fmt = fmt.upper()
+        if fmt != 'ASCII' and fmt not in self._BINARY_DATATYPES:
+            raise ValueError(f"Unbekanntes Format: {fmt}. Erlaubt: ASCII, SINT, DINT")
+        return fmt
+
+    def read_bulk(self, n, fmt=None):
+        """
+        Führt N Messungen über das Reading Memory durch und liest sie mit EINEM
+        RMEM direkt in ein numpy-Array (ohne float() pro Messwert in Python).
+        
+        Binärformate (SINT/DINT) sind skalierte Integer und brauchen einen festen
+        Messbereich. Bei Autorange wird ohne explizites fmt in ASCII übertragen.
+        
+        :param n: Anzahl der Messungen
+        :param fmt: 'ASCII', 'SINT' oder 'DINT'. None -> Format aus set_format
+        """
+        if not self.is_connected:
+            raise Exception("Gerät nicht verbunden")
+
+        import numpy as np
+
+        n = int(n)
+        if n < 1:
+            raise ValueError(f"Ungültige Anzahl Messungen: {n}")
+
+        autorange = self._state.get('range', 'AUTO') == 'AUTO'
+        if fmt is None:
+            fmt = 'ASCII' if autorange else self._bulk_format
+        else:
+            fmt = self._check_format(fmt)
+            if fmt != 'ASCII' and autorange:
+                raise ValueError(f"Format {fmt} benötigt einen festen Messbereich (kein AUTO)")
+
+        # Speicher scharf schalten, N Messungen pro Trigger, einmal auslösen
+        cmd = f"MEM FIFO;NRDGS {n},AUTO;TRIG SGL"
+        if fmt == 'ASCII':
+            # Nur weglassen, wenn der Cache das Format sicher kennt
+            if self._state.get('oformat') != 'ASCII':
+                cmd = "OFORMAT ASCII;" + cmd
+            # Nach einem Binär-Burst steht der Speicher evtl. noch auf skalierten
+            # Integern, die bei Autorange nicht eindeutig sind -> zurück auf unskaliert
+            mformat = self._state.get('mformat')
+            if mformat is None or mformat in self._BINARY_DATATYPES:
+                cmd = f"MFORMAT {self._DEFAULT_MFORMAT};" + cmd
+            self._write(cmd)
+
+            # Kompletten Speicher in einer Antwort abholen (kommagetrennt).
+            # Das Gerät antwortet erst, wenn alle N Messungen fertig sind.
+            with self._reading(n):
+                return self.inst.query_ascii_values(f"RMEM 1,{n}", container=np.array,
+                                                    separator=',')
+
+        # Das Speicherformat muss VOR dem Messen gesetzt sein
+        if self._state.get('oformat') != fmt:
+            cmd = f"OFORMAT {fmt};" + cmd
+        if self._state.get('mformat') != fmt:
+            cmd = f"MFORMAT {fmt};" + cmd
+        self._write(cmd)
+
+        with self._reading(n):
+            counts = self._query_binary(f"RMEM 1,{n}", self._BINARY_DATATYPES[fmt], n)
+
+        # Skalierungsfaktor für die Integer-Werte; Ausgabe dabei zurück auf ASCII,
+        # damit Einzelmessungen weiterhin als Text kommen.
+        scale = float(self.inst.query("OFORMAT ASCII;ISCALE?"))
+        self._state['oformat'] = 'ASCII'
+        return counts * scale
+
+    def read_bulk_binary(self, n):
+        """
+        Wie read_bulk, aber immer im Binärformat DINT (4 Byte pro Messwert).
+        Benötigt einen festen Messbereich.
+        
+        :param n: Anzahl der Messungen
+        """
+        return self.read_bulk(n, fmt='DINT')
+
+    def _query_binary(self, cmd, datatype, n):
+        """
+        Fragt N Binärwerte ohne IEEE-Header (Big Endian) als numpy-Array ab.
+        Der Terminator ist währenddessen abgeschaltet, da ein Datenbyte 0x0A
+        sonst das Lesen vorzeitig beenden würde.
+        """
+        import numpy as np
+
+        read_termination = self.inst.read_termination
+        self.inst.read_termination = None
+        try:
+            return self.inst.query_binary_values(cmd, datatype=datatype, is_big_endian=True,
+                                                 container=np.array, header_fmt='empty',
+                                                 data_points=n, expect_termination=False)
+        finally:
+            self.inst.read_termination = read_termination
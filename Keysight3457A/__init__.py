@@ -0,0 +1,3 @@
+from .Keysight3457A import HP3457A
+
+__all__ = ['HP3457A']
@@ -0,0 +1,65 @@
+# --------------------------------------------------------------------------
+# TEST BEREICH
+# Aufruf: python -m Keysight3457A
+# --------------------------------------------------------------------------
+from . import HP3457A
+
+if __name__ == "__main__":
+    # BITTE ANPASSEN: Hier die korrekte VISA Resource ID eintragen!
+    # Für GPIB meist: 'GPIB0::22::INSTR' (wobei 22 die Adresse ist)
+    # Für Seriell über VISA Adapter: 'ASRL1::INSTR'
+    VISA_ADDRESS = 'GPIB0::22::INSTR' 
+    
+    # Mocking für Testzwecke, falls kein Gerät angeschlossen ist,
+    # würde dies fehlschlagen. Daher Try/Except Block für Demo.
+    
+    import pyvisa
+
+    print("--- Start HP 3457A Test ---")
+    
+    # Etwas mehr Timeout für Init
+    dmm = HP3457A(VISA_ADDRESS, io_timeout=10000)
+    
+    try:
+        # 1. Verbinden
+        print(f"Verbinde zu {VISA_ADDRESS}...")
+        dmm.connect()
+        
+        # 2. ID Auslesen
+        dev_id = dmm.read_id()
+        print(f"Geräte ID: {dev_id}")
+        
+        # 3. DC Spannung mit NPLC 10 konfigurieren (ein einziger Befehl)
+        print("Konfiguriere DC Voltage, NPLC 10...")
+        dmm.configure("DCV", range_val="AUTO", nplc=10)
+        
+        # 4. NPLC am Gerät prüfen (Cache verwerfen, damit wirklich NPLC? gesendet wird)
+        dmm.invalidate()
+        current_nplc = dmm.get_nplc()
+        print(f"Gelesenes NPLC: {current_nplc}")
+        
+        # 5. Messung durchführen (Mehrfachmessung)
+        print("Starte 3 Messungen (ein Trigger, Reading Memory)...")
+        for i, val in enumerate(dmm.read_n_values(3)):
+            print(f"Messwert {i+1}: {val} V")
+            
+        # 6. Ohmmessung Test
+        print("Wechsle zu 2-Wire Ohm...")
+        # Schnellere Messung für Ohm
+        dmm.configure("OHM", nplc=1)
+        
+        val_ohm = dmm.read_single_value()
+        print(f"Widerstand: {val_ohm} Ohm")
+        
+    except pyvisa.errors.VisaIOError as e:
+        print("\nACHTUNG: VISA Fehler aufgetreten.")
+        print("Ist das Gerät angeschlossen und die Adresse korrekt?")
+        print(f"Detailfehler: {e}")
+    except Exception as e:
+        print(f"\nEin allgemeiner Fehler ist aufgetreten: {e}")
+    finally:
+        # Immer sauber trennen
+        print("Trenne Verbindung...")
+        dmm.disconnect()
+        HP3457A.shutdown_rm()
+        print("--- Test Ende ---")
\ No newline at end of file